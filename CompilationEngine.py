@@ -1,5 +1,7 @@
+import sys
 import VMWriter
 import CompilationTypes
+import Profiler
 from collections import namedtuple
 
 INDENT = 2
@@ -18,12 +20,15 @@ label_count = 0
 class CompilationEngine:
     '''A compilation engine for the Jack programming language'''
 
-    def __init__(self, tokenizer, ostream):
+    def __init__(self, tokenizer, ostream, reuse_locals=False, profiler=None):
         '''Initialize the compilation engine
         @tokenizer the tokenizer from the input code file
-        @ostream the output stream to write the code to'''
+        @ostream the output stream to write the code to
+        @reuse_locals share local slots between non-overlapping variables
+        @profiler a Profiler to instrument the code with, None to disable'''
         self.tokenizer = tokenizer
-        self.vm_writer = VMWriter.VMWriter(ostream)
+        self.vm_writer = VMWriter.VMWriter(ostream, reuse_locals)
+        self.profiler = profiler
 
     @staticmethod
     def get_label():
@@ -43,13 +48,90 @@ class CompilationEngine:
         class_name = self.tokenizer.advance().value
         jack_class = CompilationTypes.JackClass(class_name)
 
+        if self.profiler is not None and class_name == 'Profiler':
+            print('Error: the Profiler class is reserved when instrumenting')
+            sys.exit(1)
+
         self.tokenizer.advance() # {
 
         self.compile_class_vars(jack_class)
         self.compile_class_subroutines(jack_class)
 
+        if self.profiler is not None:
+            self.profiler.add_class(jack_class)
+            self.compile_profiler_dump(jack_class)
+
         self.tokenizer.advance() # }
 
+    def compile_profiler_dump(self, jack_class):
+        '''Compile a function printing the profiler counters of the class'''
+        jack_subroutine = CompilationTypes.JackSubroutine(
+                Profiler.DUMP_FUNCTION, 'function', 'void', jack_class
+            )
+
+        self.vm_writer.write_function(jack_subroutine)
+        for counter in self.profiler.get_class_counters(jack_class.name):
+            # Print "index: count"
+            self.vm_writer.write_int(counter.id)
+            self.vm_writer.write_call('Output', 'printInt', 1)
+            self.vm_writer.write_pop('temp', 0)
+            for c in ': ':
+                self.vm_writer.write_int(ord(c))
+                self.vm_writer.write_call('Output', 'printChar', 1)
+                self.vm_writer.write_pop('temp', 0)
+            self.compile_profiler_count(counter)
+            self.vm_writer.write_call('Output', 'println', 0)
+            self.vm_writer.write_pop('temp', 0)
+
+        self.vm_writer.write_int(0)
+        self.vm_writer.write_return()
+        self.vm_writer.write_function_end()
+
+    def compile_profiler_count(self, counter):
+        '''Compile printing the count of a two word profiler counter'''
+        low_label = CompilationEngine.get_label()
+        end_label = CompilationEngine.get_label()
+
+        # Without a high word, the low word is the whole count
+        self.vm_writer.write_push('static', counter.high_id)
+        self.vm_writer.write_int(0)
+        self.vm_writer.write('eq')
+        self.vm_writer.write_if(low_label)
+        self.vm_writer.write_push('static', counter.low_id)
+        self.vm_writer.write_call('Output', 'printInt', 1)
+        self.vm_writer.write_pop('temp', 0)
+        self.vm_writer.write_goto(end_label)
+
+        # Otherwise print the high word and the low word padded with zeros
+        self.vm_writer.write_label(low_label)
+        self.vm_writer.write_push('static', counter.high_id)
+        self.vm_writer.write_call('Output', 'printInt', 1)
+        self.vm_writer.write_pop('temp', 0)
+        digits = Profiler.COUNTER_BASE // 10
+        while digits > 1:
+            pad_label = CompilationEngine.get_label()
+            self.vm_writer.write_push('static', counter.low_id)
+            self.vm_writer.write_int(digits)
+            self.vm_writer.write('lt')
+            self.vm_writer.write_if(pad_label)
+            self.vm_writer.write_int(ord('0'))
+            self.vm_writer.write_call('Output', 'printChar', 1)
+            self.vm_writer.write_pop('temp', 0)
+            self.vm_writer.write_label(pad_label)
+            digits //= 10
+        self.vm_writer.write_push('static', counter.low_id)
+        self.vm_writer.write_call('Output', 'printInt', 1)
+        self.vm_writer.write_pop('temp', 0)
+
+        self.vm_writer.write_label(end_label)
+
+    def compile_counter(self, jack_subroutine, kind, line):
+        '''Increment a runtime counter of the given kind, if instrumenting'''
+        if self.profiler is not None:
+            counter = self.profiler.add_counter(jack_subroutine, kind, line)
+            self.vm_writer.write_counter(counter, Profiler.COUNTER_BASE,
+                    CompilationEngine.get_label())
+
     def compile_class_vars(self, jack_class):
         '''Compile the class variable declarations'''
         
@@ -88,6 +170,7 @@ class CompilationEngine:
         while token is not None and token.type == 'keyword'\
                 and token.value in ['constructor', 'function', 'method']:
             
+            line = self.tokenizer.current_line()
             # Advance for same reason as in varDec
             subroutine_type = self.tokenizer.advance().value
             # return type
@@ -95,6 +178,12 @@ class CompilationEngine:
             # name
             name = self.tokenizer.advance().value
 
+            if self.profiler is not None and name == Profiler.DUMP_FUNCTION:
+                print('Error: {}.{} is reserved when instrumenting'.format(
+                        jack_class.name, name
+                    ))
+                sys.exit(1)
+
             jack_subroutine = CompilationTypes.JackSubroutine(
                     name, subroutine_type, return_type, jack_class
                 )
@@ -105,7 +194,7 @@ class CompilationEngine:
 
             self.tokenizer.advance() # ) - close parameterList
 
-            self.compile_subroutine_body(jack_subroutine)
+            self.compile_subroutine_body(jack_subroutine, line)
 
             # load the next token to check 
             token = self.tokenizer.current_token()
@@ -135,14 +224,16 @@ class CompilationEngine:
                 still_vars = False
 
 
-    def compile_subroutine_body(self, jack_subroutine):
-        '''Compile the subroutine body'''
+    def compile_subroutine_body(self, jack_subroutine, line=None):
+        '''Compile the subroutine body
+        @line the source line of the subroutine, used when instrumenting'''
 
         self.tokenizer.advance() # {
 
         self.compile_subroutine_vars(jack_subroutine)
 
         self.vm_writer.write_function(jack_subroutine)
+        self.compile_counter(jack_subroutine, 'entry', line)
 
         if jack_subroutine.subroutine_type == 'constructor':
             field_count = jack_subroutine.jack_class.field_symbols
@@ -155,6 +246,7 @@ class CompilationEngine:
             self.vm_writer.write_pop('pointer', 0)
 
         self.compile_statements(jack_subroutine)
+        self.vm_writer.write_function_end()
 
         self.tokenizer.advance() # }
 
@@ -237,6 +329,7 @@ class CompilationEngine:
 
     def compile_statement_while(self, jack_subroutine):
         '''Compile the while statment'''
+        line = self.tokenizer.current_line()
         self.tokenizer.advance() # while
         self.tokenizer.advance() # (
 
@@ -250,6 +343,7 @@ class CompilationEngine:
         self.tokenizer.advance() # {
 
         self.vm_writer.write_if(false_label)
+        self.compile_counter(jack_subroutine, 'loop', line)
 
         # Compile inner statements
         self.compile_statements(jack_subroutine)
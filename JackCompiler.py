@@ -2,8 +2,9 @@ import sys
 import os
 import JackTokenizer
 import CompilationEngine
+import Profiler
 
-def compile_file(file_path):
+def compile_file(file_path, reuse_locals=False, profiler=None):
 	'''Compile a file by its path, save the result to a file
 	with the same name and a vm suffix'''
 		
@@ -15,34 +16,69 @@ def compile_file(file_path):
 		ofile_path = file_path_no_ext+'.vm'
 		with open(ofile_path, 'w') as ofile:
 			tokenizer = JackTokenizer.JackTokenizer(ifile.read())
-			compiler = CompilationEngine.CompilationEngine(tokenizer, ofile)
+			compiler = CompilationEngine.CompilationEngine(tokenizer, ofile,
+					reuse_locals, profiler)
 			compiler.compile_class()
 
-def compile_dir(dir_path):
+def compile_dir(dir_path, reuse_locals=False, profiler=None):
 	'''Compile all Jack files in a directory'''
 	for file in os.listdir(dir_path):
 		file_path = os.path.join(dir_path, file)
 		_, file_ext = os.path.splitext(file_path)
 		# Choose only jack files
 		if os.path.isfile(file_path) and file_ext.lower()=='.jack':
-			compile_file(file_path)
+			compile_file(file_path, reuse_locals, profiler)
+
+def write_profiler(dir_path, profiler):
+	'''Write the Profiler class VM code and the sidecar counter map'''
+	with open(os.path.join(dir_path, 'Profiler.vm'), 'w') as ofile:
+		profiler.write_vm(ofile)
+	with open(os.path.join(dir_path, 'Profiler.map'), 'w') as ofile:
+		profiler.write_map(ofile)
 
 def main():
 	"""The main program, loading the file/files and calling the translator"""
-	if len(sys.argv) < 2:
-		print('usage: JackCompiler (file|dir)'.format(sys.argv[0]))
+	options = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+	paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+	valid_options = ['--reuse-locals', '--instrument']
+	if len(paths) < 1 or any(opt not in valid_options for opt in options):
+		print('usage: JackCompiler [--reuse-locals] [--instrument] (file|dir)'.format(sys.argv[0]))
 		sys.exit(1)
 
-	input_path = sys.argv[1]
+	input_path = paths[0]
+	reuse_locals = '--reuse-locals' in options
+	profiler = Profiler.Profiler() if '--instrument' in options else None
 
 	if os.path.isdir(input_path):
-		compile_dir(input_path)
+		# Avoid overwriting the compiled code of a user Profiler
+		profiler_path = os.path.join(input_path, 'Profiler.jack')
+		if profiler is not None and os.path.exists(profiler_path):
+			print('Error: Profiler.jack is reserved when instrumenting')
+			sys.exit(1)
+		compile_dir(input_path, reuse_locals, profiler)
 	elif os.path.isfile(input_path):
-		compile_file(input_path)
+		# Counter ids and the generated Profiler must cover the whole program
+		if profiler is not None:
+			print('Error: --instrument requires a directory of the whole program')
+			sys.exit(1)
+		compile_file(input_path, reuse_locals)
 	else:
 		print("Invalid file/directory, compilation failed")
 		sys.exit(1)
 
+	if profiler is not None:
+		static_words = profiler.static_words()
+		if static_words > Profiler.STATIC_WORDS:
+			print('Error: instrumented program needs {} static words, only {} '
+				'are available'.format(static_words, Profiler.STATIC_WORDS))
+			sys.exit(1)
+		elif static_words > Profiler.STATIC_WARNING:
+			print('Warning: instrumented program needs {} of {} static words, '
+				'the OS statics may not fit'.format(
+					static_words, Profiler.STATIC_WORDS))
+
+		write_profiler(input_path, profiler)
+
 
 if __name__=="__main__":
 	main()
\ No newline at end of file
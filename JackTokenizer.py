@@ -37,40 +37,55 @@ class JackTokenizer:
 
 		# Use non-greedy regex to avoid eating lines of code
 		uncommented = re.sub('//.*?\n', '\n', file)
-		uncommented = re.sub('/\*.*?\*/', '', uncommented, flags=re.DOTALL)
+		# Keep the newlines of block comments, to preserve line numbers
+		uncommented = re.sub('/\*.*?\*/', lambda m: '\n'*m.group().count('\n'),
+			uncommented, flags=re.DOTALL)
 		return uncommented
 
 	def __init__(self, file):
 		'''Initialize the tokenizer for a given file, provided as utf-8 encoded
 		python string'''
 		self.code = JackTokenizer.remove_comments(file)
-		self.tokens = self.tokenize()
+		self.tokens, self.lines = self.tokenize()
 
 	def tokenize(self):
-		'''Tokenize the given input file without comments'''
-		split_code = re.split(self.RE_SPLIT, self.code)
+		'''Tokenize the given input file without comments, returns the tokens
+		and the source line of each token'''
 		tokens = []
+		lines = []
 
-		for lex in split_code:
-			# Skip non-tokens
-			if lex is None or re.match('^\s*$', lex):
-				continue
+		# Tokens never span lines, so split line by line to track numbers
+		for line_number, code_line in enumerate(self.code.split('\n'), 1):
+			split_code = re.split(self.RE_SPLIT, code_line)
 
-			# Check all possible lexical types, if 
-			for expr, lex_type in self.LEXICAL_TYPES:
-				if re.match(expr, lex):
-					tokens.append(Token(lex_type, lex))
-					break
-			else:
-				print('Error: unknown token', lex)
-				sys.exit(1)
+			for lex in split_code:
+				# Skip non-tokens
+				if lex is None or re.match('^\s*$', lex):
+					continue
 
-		return tokens
+				# Check all possible lexical types, if 
+				for expr, lex_type in self.LEXICAL_TYPES:
+					if re.match(expr, lex):
+						tokens.append(Token(lex_type, lex))
+						lines.append(line_number)
+						break
+				else:
+					print('Error: unknown token', lex)
+					sys.exit(1)
+
+		return tokens, lines
 
 	def current_token(self):
 		'''Return the current token, if not existent return None'''
 		return self.tokens[0] if self.tokens else None
 
+	def current_line(self):
+		'''Return the source line of the current token, if not existent
+		return None'''
+		return self.lines[0] if self.lines else None
+
 	def advance(self):
 		'''Advance to the next token, return current token'''
+		if self.lines:
+			self.lines.pop(0)
 		return self.tokens.pop(0) if self.tokens else None
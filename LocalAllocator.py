@@ -0,0 +1,109 @@
+def successors(commands, index, labels):
+	'''Return the indices of the commands that may run after commands[index]'''
+	parts = commands[index].split()
+	if parts[0] == 'goto':
+		return [labels[parts[1]]]
+	if parts[0] == 'return':
+		return []
+
+	following = [index+1] if index+1 < len(commands) else []
+	if parts[0] == 'if-goto':
+		following.append(labels[parts[1]])
+	return following
+
+def local_access(command):
+	'''Return a tuple of (action, local index) for a command accessing the
+	local segment, or None if the local segment isn't accessed'''
+	parts = command.split()
+	if len(parts) == 3 and parts[1] == 'local':
+		return parts[0], int(parts[2])
+	return None
+
+def compute_liveness(commands):
+	'''Compute the locals live after every command in a function body,
+	returns the lists of live-in and live-out sets per command'''
+	labels = {}
+	for index, command in enumerate(commands):
+		parts = command.split()
+		if parts[0] == 'label':
+			labels[parts[1]] = index
+
+	flow = [successors(commands, index, labels) for index in range(len(commands))]
+	live_in = [set() for _ in commands]
+	live_out = [set() for _ in commands]
+
+	# Iterate backwards until no live set changes
+	changed = True
+	while changed:
+		changed = False
+		for index in reversed(range(len(commands))):
+			out = set()
+			for succ in flow[index]:
+				out |= live_in[succ]
+
+			current = set(out)
+			access = local_access(commands[index])
+			if access is not None:
+				action, local = access
+				if action == 'pop':
+					current.discard(local)
+				else:
+					current.add(local)
+
+			if out != live_out[index] or current != live_in[index]:
+				live_out[index] = out
+				live_in[index] = current
+				changed = True
+
+	return live_in, live_out
+
+def allocate_locals(commands):
+	'''Share local slots between variables whose live ranges never overlap.
+	@commands the VM commands of a single function body
+	returns the rewritten commands and the number of local slots needed'''
+	if not commands:
+		return commands, 0
+
+	live_in, live_out = compute_liveness(commands)
+
+	used = set()
+	interference = {}
+	for index, command in enumerate(commands):
+		access = local_access(command)
+		if access is None:
+			continue
+
+		action, local = access
+		used.add(local)
+		interference.setdefault(local, set())
+		# A store clobbers the slot, so it can't be shared with anything
+		# still needed afterwards
+		if action == 'pop':
+			for other in live_out[index] - {local}:
+				interference[local].add(other)
+				interference.setdefault(other, set()).add(local)
+
+	# Locals read before any store rely on the zero initialization of the
+	# frame, each needs a slot of its own
+	for local in live_in[0]:
+		interference[local] |= live_in[0] - {local}
+
+	# Greedy coloring, in order of declaration
+	slots = {}
+	for local in sorted(used):
+		taken = {slots[other] for other in interference[local] if other in slots}
+		slot = 0
+		while slot in taken:
+			slot += 1
+		slots[local] = slot
+
+	rewritten = []
+	for command in commands:
+		access = local_access(command)
+		if access is not None:
+			action, local = access
+			command = '{} local {}'.format(action, slots[local])
+		rewritten.append(command)
+
+	local_count = max(slots.values()) + 1 if slots else 0
+	return rewritten, local_count
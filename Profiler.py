@@ -0,0 +1,84 @@
+import VMWriter
+import CompilationTypes
+from collections import namedtuple
+
+ProfilerCounter = namedtuple('ProfilerCounter',
+	['id', 'low_id', 'high_id', 'class_name', 'subroutine', 'kind', 'line'])
+
+# A counter is two decimal words, the low word carries into the high one
+# when it reaches the base, allowing counts up to 32767*COUNTER_BASE
+COUNTER_BASE = 10000
+
+# All classes share the Hack static area, RAM[16..255]
+STATIC_WORDS = 240
+# Leave headroom for the statics of the OS classes
+STATIC_WARNING = 200
+
+# The generated function each instrumented class uses to print its counters
+DUMP_FUNCTION = 'profilerDump'
+
+class Profiler:
+	'''Runtime counters for an instrumented build of Jack programs.
+	Each class keeps its counters in pairs of static slots reserved after its
+	own statics, the generated Profiler.dump prints all of them'''
+
+	def __init__(self):
+		self.counters = []
+		self.class_counters = dict()
+		self.class_static_words = dict()
+
+	def add_counter(self, jack_subroutine, kind, line):
+		'''Add a counter of the given kind ('entry' or 'loop') in a subroutine,
+		return the counter'''
+		jack_class = jack_subroutine.jack_class
+		class_counters = self.class_counters.setdefault(jack_class.name, [])
+
+		low_id = jack_class.static_symbols + 2*len(class_counters)
+		counter = ProfilerCounter(
+				len(self.counters), low_id, low_id + 1,
+				jack_class.name, jack_subroutine.name, kind, line
+			)
+		self.counters.append(counter)
+		class_counters.append(counter)
+
+		return counter
+
+	def add_class(self, jack_class):
+		'''Account for the static words of a compiled class, its own statics
+		and its counters'''
+		counter_count = len(self.get_class_counters(jack_class.name))
+		self.class_static_words[jack_class.name] =\
+				jack_class.static_symbols + 2*counter_count
+
+	def static_words(self):
+		'''Return the static words used by all compiled classes'''
+		return sum(self.class_static_words.values())
+
+	def get_class_counters(self, class_name):
+		'''Get the counters of a class'''
+		return self.class_counters.get(class_name, [])
+
+	def write_vm(self, ostream):
+		'''Write the Profiler class VM code, calling the dump function of
+		every instrumented class'''
+		vm_writer = VMWriter.VMWriter(ostream)
+		jack_subroutine = CompilationTypes.JackSubroutine(
+				'dump', 'function', 'void', CompilationTypes.JackClass('Profiler')
+			)
+
+		vm_writer.write_function(jack_subroutine)
+		for class_name in self.class_counters:
+			vm_writer.write_call(class_name, DUMP_FUNCTION, 0)
+			vm_writer.write_pop('temp', 0)
+		vm_writer.write_int(0)
+		vm_writer.write_return()
+		vm_writer.write_function_end()
+
+	def write_map(self, ostream):
+		'''Write the sidecar map from counter index to its source'''
+		ostream.write('# index\tclass\tsubroutine\tkind\tline\n')
+		for counter in self.counters:
+			ostream.write('{}\t{}\t{}\t{}\t{}\n'.format(
+					counter.id, counter.class_name, counter.subroutine,
+					counter.kind, counter.line
+				))
@@ -1,3 +1,6 @@
+import io
+import LocalAllocator
+
 kind_to_segment = {'static': 'static',
                    'field': 'this',
                    'arg': 'argument',
@@ -7,10 +10,15 @@ class VMWriter:
 	'''A jack to VM writer, used by the compiler to output the code matching
 	to the analyzed code'''
 
-	def __init__(self, ostream):
-		'''Initialize the VMWriter with a given output stream'''
+	def __init__(self, ostream, reuse_locals=False):
+		'''Initialize the VMWriter with a given output stream
+		@reuse_locals share local slots between variables with disjoint
+		live ranges, reducing the locals declared by each function'''
 		self.ostream = ostream
 		self.label_count = 0
+		self.reuse_locals = reuse_locals
+		self.output = ostream
+		self.function_name = None
 
 	def write_if(self, label):
 		'''Write an if-goto used in while/if.
@@ -33,7 +41,25 @@ class VMWriter:
 		local_vars = jack_subroutine.var_symbols
 		subroutine_type = jack_subroutine.subroutine_type
 
-		self.ostream.write('function {}.{} {}\n'.format(class_name, name, local_vars))
+		if self.reuse_locals:
+			# Buffer the body, the local count is known only after it's done
+			self.function_name = '{}.{}'.format(class_name, name)
+			self.ostream = io.StringIO()
+		else:
+			self.ostream.write('function {}.{} {}\n'.format(class_name, name, local_vars))
+
+	def write_function_end(self):
+		'''Finish the function currently written, flushing a buffered body'''
+		if not self.reuse_locals:
+			return
+
+		commands = self.ostream.getvalue().splitlines()
+		commands, local_vars = LocalAllocator.allocate_locals(commands)
+
+		self.ostream = self.output
+		self.ostream.write('function {} {}\n'.format(self.function_name, local_vars))
+		for command in commands:
+			self.write(command)
 
 	def write_return(self):
 		'''Write the return statement'''
@@ -61,6 +87,28 @@ class VMWriter:
 		segment = kind_to_segment[kind]
 		self.write_push(segment, offset)
 
+	def write_counter(self, profiler_counter, counter_base, carry_label):
+		'''Increment a two word profiler counter, kept in the static segment.
+		@counter_base the value at which the low word carries to the high one
+		@carry_label a label to skip the carry with'''
+		self.write_push('static', profiler_counter.low_id)
+		self.write_int(1)
+		self.write('add')
+		self.write_pop('static', profiler_counter.low_id)
+
+		# Carry into the high word once the low word reaches the base
+		self.write_push('static', profiler_counter.low_id)
+		self.write_int(counter_base)
+		self.write('eq')
+		self.write_if(carry_label)
+		self.write_int(0)
+		self.write_pop('static', profiler_counter.low_id)
+		self.write_push('static', profiler_counter.high_id)
+		self.write_int(1)
+		self.write('add')
+		self.write_pop('static', profiler_counter.high_id)
+		self.write_label(carry_label)
+
 	def write_pop(self, segment, offset):
 		'''Pop the value in the top of the stack to segment:offset'''
 		self.ostream.write('pop {0} {1}\n'.format(segment, offset))